@@ -23,6 +23,14 @@ def test_caching_read():
     assert db.all() == []
 
 
+def test_caching_count(storage):
+    storage.write({'_default': {'1': doc}})
+
+    # The unflushed data has to be counted
+    assert storage.memory is None
+    assert storage.count('_default') == 1
+
+
 def test_caching_write_many(storage):
     storage.WRITE_CACHE_SIZE = 3
 
@@ -103,3 +111,13 @@ def test_caching_json_write(tmpdir):
     # Reopen database
     with TinyDB(path, storage=CachingMiddleware(JSONStorage)) as db:
         assert db.all() == [{'key': 'value'}]
+
+
+def test_caching_read_does_not_create_table(tmpdir):
+    path = str(tmpdir.join('test.db'))
+
+    with TinyDB(path, storage=CachingMiddleware(JSONStorage)) as db:
+        db.table('lookup_only').all()
+
+    with TinyDB(path, storage=JSONStorage) as db:
+        assert db.tables() == set()
@@ -2,7 +2,7 @@ import re
 
 import pytest
 
-from tinydb.queries import Query, where
+from tinydb.queries import Query, QueryInstance, where
 
 
 def test_no_path():
@@ -443,3 +443,93 @@ def test_get_item():
 
     assert query({'test': 1})
     assert not query({'test': 0})
+
+
+def test_compile():
+    query = ((where('a') == 1) & (where('b')['c'] > 2)) | \
+        ~where('d').exists() | (where('e') != 'x')
+
+    predicate = query._compile()
+    assert predicate is not query
+
+    # Equal queries share the generated function
+    assert predicate is (((where('a') == 1) & (where('b')['c'] > 2)) |
+                         ~where('d').exists() | (where('e') != 'x'))._compile()
+
+    docs = [
+        {'a': 1, 'b': {'c': 3}, 'd': 0, 'e': 'x'},
+        {'a': 1, 'b': {'c': 1}, 'd': 0, 'e': 'x'},
+        {'a': 1, 'b': 5, 'd': 0, 'e': 'x'},
+        {'a': 1, 'b': {'c': 'str'}, 'd': 0, 'e': 'x'},
+        {'b': {'c': 3}, 'e': 'x'},
+        {'d': 0, 'e': 'y'},
+        {'d': 0},
+    ]
+    for doc in docs:
+        assert predicate(doc) == query(doc)
+
+
+def test_compile_order():
+    calls = []
+
+    class Doc(dict):
+        def __getitem__(self, key):
+            calls.append(key)
+            return super().__getitem__(key)
+
+    query = (where('a')['b'] > 1) & (where('c') == 2)
+    assert not query._compile()(Doc({'a': {'b': 2}, 'c': 3}))
+
+    # The cheaper equality test runs first and short-circuits the other one
+    assert calls == ['c']
+
+
+def test_compile_long_chain():
+    query = where('a') == 0
+    for i in range(1, 250):
+        query = query & (where('a') != i)
+
+    predicate = query._compile()
+    assert predicate is not query
+    assert predicate({'a': 0})
+    assert not predicate({'a': 1})
+
+    # Alternating operators can't be flattened and are too deeply nested
+    # to compile, so the query itself is used
+    query = where('a') == 0
+    for i in range(1, 250):
+        if i % 2:
+            query = query & (where('a') != i)
+        else:
+            query = query | (where('a') == i)
+
+    assert query._compile() is query
+
+
+def test_compile_fallback():
+    # Queries that aren't fully described by their hash are not compiled
+    for query in [where('a') == [1, 2],
+                  where('a').matches('x', flags=re.IGNORECASE),
+                  where('a').map(str) == '1',
+                  where('a').test(lambda v: v) & (where('b') == 1),
+                  Query()]:
+        assert query._compile() is query
+
+
+def test_compile_str_subclass():
+    class Key(str):
+        def __repr__(self):
+            return "'a'] or _injected(value) or value['a'"
+
+    class Op(str):
+        def __format__(self, spec):
+            return 'or _injected(value) or'
+
+    operands = frozenset([('==', ('a',), 1), ('==', ('b',), 2)])
+
+    # Only plain strings are put into the generated code
+    for query in [Query()[Key('a')] == 1,
+                  QueryInstance(lambda value: True, (Op('and'), operands))]:
+        assert query._compile() is query
+
+    assert (Query()[Key('a')] == 1)({'a': 1})
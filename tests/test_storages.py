@@ -28,6 +28,68 @@ def test_json(tmpdir):
     storage.close()
 
 
+def test_count(tmpdir):
+    path = str(tmpdir.join('test.db'))
+    storage = JSONStorage(path)
+    assert storage.count('_default') == 0
+
+    storage.write({'_default': {'1': doc, '2': doc}, 'other': {}})
+    assert storage.count('_default') == 2
+    assert storage.count('other') == 0
+    assert storage.count('missing') == 0
+    storage.close()
+
+
+def test_json_external_changes(tmpdir):
+    path = str(tmpdir.join('test.db'))
+    db = TinyDB(path)
+    other = TinyDB(path)
+
+    db.insert({'int': 1})
+    assert len(other.all()) == 1
+
+    # The file has changed, even though the storage instance is different
+    db.insert({'int': 2})
+    assert len(other.all()) == 2
+
+    db.close()
+    other.close()
+
+
+def test_json_len_reads_once(tmpdir):
+    reads = 0
+
+    class MyStorage(JSONStorage):
+        def read(self):
+            nonlocal reads
+            reads += 1
+
+            return super().read()
+
+    path = str(tmpdir.join('test.db'))
+    with TinyDB(path, storage=MyStorage) as db:
+        table = db.table('table')
+        table.insert({'int': 1})
+        table.clear_cache()
+        reads = 0
+
+        for _ in range(5):
+            assert len(table) == 1
+        table.all()
+
+        # Without its own count(), len() fills the read cache
+        assert reads == 1
+
+
+def test_memory_count():
+    storage = MemoryStorage()
+    assert storage.count('_default') == 0
+
+    storage.write({'_default': {1: doc, 2: doc}})
+    assert storage.count('_default') == 2
+    assert storage.count('missing') == 0
+
+
 def test_json_kwargs(tmpdir):
     db_file = tmpdir.join('test.db')
     db = TinyDB(str(db_file), sort_keys=True, indent=4, separators=(',', ': '))
@@ -185,11 +247,44 @@ def test_read_once():
 
         db.insert({'foo': 'bar'})
 
-        assert count == 3  # One for getting the next ID, one for the insert
+        assert count == 1  # The insert reuses the cached data
 
         db.all()
 
-        assert count == 4
+        assert count == 1  # The data written by the insert is still cached
+
+        assert db.get(doc_id=42) is None
+        assert not db.contains(doc_id=42)
+
+        assert count == 1  # Missing IDs are looked up in the cached data
+
+
+def test_update_multiple_writes_once():
+    writes = 0
+
+    # noinspection PyAbstractClass
+    class MyStorage(Storage):
+        def __init__(self):
+            self.memory = None
+
+        def read(self):
+            return self.memory
+
+        def write(self, data):
+            nonlocal writes
+            writes += 1
+
+            self.memory = data
+
+    with TinyDB(storage=MyStorage) as db:
+        db.insert_multiple([{'char': 'a'}, {'char': 'b'}])
+        assert writes == 1
+
+        assert db.update_multiple([
+            ({'int': 1}, where('char') == 'a'),
+            ({'int': 2}, where('char') == 'b'),
+        ]) == [1, 2]
+        assert writes == 2
 
 
 def test_custom_with_exception():
@@ -49,6 +49,39 @@ def test_multiple_tables(db):
     assert len(table3) == 0
 
 
+def test_read_cache(db):
+    table = db.table('table1')
+    other = type(table)(db.storage, 'table1')
+
+    table.insert({'int': 1})
+    assert len(other) == 1
+
+    other.insert({'int': 2})
+    assert len(table) == 2
+
+    db.drop_table('table1')
+    assert len(table) == 0
+
+
+def test_next_id_not_reused(db):
+    table = db.table('table1')
+    table.insert_multiple({'int': i} for i in range(3))
+    table.remove(doc_ids=[3])
+
+    # Writing another table makes this table read the storage again
+    db.table('table2').insert({'int': 1})
+
+    assert table.insert({'int': 3}) == 4
+
+
+def test_read_does_not_create_table(db):
+    db.table('foo').all()
+    assert len(db.table('bar')) == 0
+    db.table('baz').search(where('int') == 1)
+
+    assert db.tables() == {'_default'}
+
+
 def test_caching(db):
     table1 = db.table('table1')
     table2 = db.table('table1')
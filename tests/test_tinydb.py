@@ -121,6 +121,27 @@ def test_insert_multiple_with_doc_ids(db: TinyDB):
     with pytest.raises(ValueError):
         db.insert_multiple([Document({'int': 1, 'char': 'a'}, 12)])
 
+    with pytest.raises(ValueError):
+        db.insert_multiple([Document({'int': 1, 'char': 'a'}, 80),
+                            Document({'int': 1, 'char': 'b'}, 80)])
+
+
+def test_insert_multiple_with_mixed_ids(db: TinyDB):
+    db.drop_tables()
+
+    assert db.insert_multiple([
+        {'int': 1, 'char': 'a'},
+        Document({'int': 1, 'char': 'b'}, 2),
+        {'int': 1, 'char': 'c'},
+    ]) == [3, 2, 4]
+    assert db.get(doc_id=2) == {'int': 1, 'char': 'b'}
+    assert db.insert({'int': 1, 'char': 'd'}) == 5
+
+    # A failed insert doesn't use up any IDs
+    with pytest.raises(ValueError):
+        db.insert_multiple([Document({'int': 1}, 50), 'invalid'])
+    assert db.insert({'int': 1, 'char': 'e'}) == 6
+
 
 def test_insert_invalid_type_raises_error(db: TinyDB):
     with pytest.raises(ValueError, match='Document is not a Mapping'):
@@ -545,6 +566,42 @@ def test_insert_string(tmpdir):
         _db.insert({'int': 3})  # Does not fail
 
 
+def test_nested_values_not_shared(tmpdir):
+    path = str(tmpdir.join('db.json'))
+
+    with TinyDB(path) as _db:
+        tags = ['a']
+        _db.insert({'tags': tags})
+        tags.append('insert')
+
+        _db.all()[0]['tags'].append('all')
+        _db.search(where('tags').exists())[0]['tags'].append('search')
+        _db.get(doc_id=1)['tags'].append('get')
+        next(iter(_db))['tags'].append('iter')
+
+        # An unrelated write must not store any of the changes above
+        _db.insert({'other': 1})
+
+    with TinyDB(path) as _db:
+        assert _db.get(doc_id=1) == {'tags': ['a']}
+
+
+def test_nested_values_not_shared_after_update(db: TinyDB):
+    db.drop_tables()
+    db.insert({'tags': ['a'], 'meta': {'deep': [1]}})
+    db.insert({'flat': 1})
+
+    db.update({'tags': 'none'})
+    db.update(lambda doc: doc.update(flat=[{'x': 1}]), doc_ids=[2])
+    db.update({'meta': {'deep': {'x': [2]}}}, doc_ids=[1])
+
+    db.get(doc_id=2)['flat'][0]['x'] = 2
+    db.get(doc_id=1)['meta']['deep']['x'].append(3)
+
+    assert db.all() == [{'tags': 'none', 'meta': {'deep': {'x': [2]}}},
+                        {'tags': 'none', 'flat': [{'x': 1}]}]
+
+
 def test_insert_invalid_dict(tmpdir):
     path = str(tmpdir.join('db.json'))
 
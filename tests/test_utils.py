@@ -106,3 +106,24 @@ def test_freeze():
 
     with pytest.raises(TypeError):
         frozen[3].update({'a': 9})
+
+
+def test_freeze_nested():
+    nested = 1
+    for _ in range(5000):
+        nested = {'a': [nested]}
+
+    frozen = freeze(nested)
+    for _ in range(5000):
+        assert isinstance(frozen, FrozenDict)
+        frozen = frozen['a'][0]
+    assert frozen == 1
+
+    shared = [1, 2]
+    assert freeze({'a': shared, 'b': [shared]}) == \
+        FrozenDict({'a': (1, 2), 'b': ((1, 2),)})
+
+    cyclic = [1]
+    cyclic.append([cyclic])
+    with pytest.raises(ValueError):
+        freeze(cyclic)
@@ -4,7 +4,7 @@ This module contains the main component of TinyDB: the database.
 from typing import Dict, Iterator, Set, Type
 from . import JSONStorage
 from .storages import Storage
-from .table import Table, Document
+from .table import Table, Document, _bump_storage_version
 from .utils import with_typehint
 TableBase: Type[Table] = with_typehint(Table)
 
@@ -119,6 +119,7 @@ class TinyDB(TableBase):
         Drop all tables from the database. **CANNOT BE REVERSED!**
         """
         self._storage.write({})
+        _bump_storage_version(self._storage)
         self._tables.clear()
 
     def drop_table(self, name: str) -> None:
@@ -133,6 +134,7 @@ class TinyDB(TableBase):
 
         data.pop(name, None)
         self._storage.write(data)
+        _bump_storage_version(self._storage)
         self._tables.pop(name, None)
 
     @property
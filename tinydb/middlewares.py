@@ -67,6 +67,10 @@ class Middleware:
         """
         return getattr(self.__dict__['storage'], name)
 
+    # Counting is not forwarded to the underlying storage, as the middleware
+    # may change what ``read`` returns
+    count = Storage.count
+
 class CachingMiddleware(Middleware):
     """
     Add some caching to TinyDB.
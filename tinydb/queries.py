@@ -18,6 +18,7 @@ False
 import re
 import sys
 from typing import Mapping, Tuple, Callable, Any, Union, List, Optional
+from weakref import WeakValueDictionary
 from .utils import freeze
 if sys.version_info >= (3, 8):
     from typing import Protocol
@@ -25,6 +26,137 @@ else:
     from typing_extensions import Protocol
 __all__ = ('Query', 'QueryLike', 'where')
 
+# Predicates generated by ``_compile_predicate``, shared between equal queries
+_compiled_predicates: 'WeakValueDictionary[Tuple, Callable[[Mapping], bool]]' = WeakValueDictionary()
+
+# Operators that are compiled into a comparison, and the right-hand side
+# types for which the frozen value stored in the hash equals the original one
+_COMPARISONS = ('==', '!=', '<', '<=', '>', '>=')
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+_LEAF_TEMPLATE = '''
+def {name}(value):
+    try:
+        {statement}
+    except (KeyError, TypeError, ValueError):
+        return False
+'''
+
+
+def _compile_predicate(hashval: Tuple) -> Optional[Callable[[Mapping], bool]]:
+    """
+    Generate a specialized function for a query from its hash value.
+
+    Only queries consisting of comparisons with scalar values, ``exists()``
+    and ``noop()`` tests combined using AND, OR and NOT are supported, as
+    only for those the hash value completely describes the query. The
+    generated code resolves the document paths directly instead of walking
+    the tree of query instances for every document. The operands of AND and
+    OR are reordered so cheaper tests run first, which is safe as none of
+    the supported tests has side effects.
+
+    :param hashval: The hash value of the query
+    :return: The generated function or ``None`` if the query isn't supported
+    """
+    try:
+        return _compiled_predicates[hashval]
+    except KeyError:
+        pass
+    except TypeError:
+        return None
+
+    leaves: List[str] = []
+    constants = {}
+
+    # Generates the code for a part of the query together with an estimate
+    # of how expensive it is to evaluate
+    def generate(node) -> Optional[Tuple[str, int]]:
+        # Operators and path parts end up in the generated code, so only
+        # plain strings are accepted (a subclass could override __repr__)
+        if not isinstance(node, tuple) or not node or type(node[0]) is not str:
+            return None
+
+        op = node[0]
+        if op in ('and', 'or') and len(node) == 2:
+            # Flatten nested operations of the same kind into a single
+            # expression, so long chains don't nest parentheses
+            operands = []
+            pending = list(node[1])
+            while pending:
+                child = pending.pop()
+                if isinstance(child, tuple) and len(child) == 2 and \
+                        type(child[0]) is str and child[0] == op:
+                    pending.extend(child[1])
+                else:
+                    operands.append(child)
+
+            parts = []
+            for child in operands:
+                part = generate(child)
+                if part is None:
+                    return None
+                parts.append(part)
+            if not parts:
+                return None
+
+            # Evaluate the cheapest tests first, so the short-circuiting of
+            # AND and OR skips the expensive ones more often
+            parts.sort(key=lambda part: part[1])
+            expression = ' {} '.format(op).join(code for code, _ in parts)
+            return '({})'.format(expression), sum(cost for _, cost in parts)
+
+        if op == 'not' and len(node) == 2:
+            part = generate(node[1])
+            if part is None:
+                return None
+            return '(not {})'.format(part[0]), part[1]
+
+        if op == 'noop':
+            return 'True', 0
+
+        if op not in _COMPARISONS + ('exists',) or len(node) < 2:
+            return None
+
+        path = node[1]
+        if not path or not all(type(part) is str for part in path):
+            return None
+        lookup = 'value' + ''.join('[{!r}]'.format(part) for part in path)
+
+        # Equality tests and existence checks are cheaper than ordering
+        # comparisons, and every additional path part adds a lookup
+        cost = len(path) + (0 if op in ('==', '!=', 'exists') else 1)
+
+        if op == 'exists':
+            statement = '{}\n        return True'.format(lookup)
+        elif len(node) == 3 and type(node[2]) in _SCALAR_TYPES:
+            constant = '_c{}'.format(len(constants))
+            constants[constant] = node[2]
+            statement = 'return {} {} {}'.format(lookup, op, constant)
+        else:
+            return None
+
+        name = '_q{}'.format(len(leaves))
+        leaves.append(_LEAF_TEMPLATE.format(name=name, statement=statement))
+        return '{}(value)'.format(name), cost
+
+    try:
+        generated = generate(hashval)
+        if generated is None:
+            return None
+
+        source = ''.join(leaves) + '\ndef predicate(value):\n    return {}\n'.format(generated[0])
+        namespace = dict(constants)
+        exec(compile(source, '<tinydb query>', 'exec'), namespace)
+    except (SyntaxError, MemoryError, RecursionError):
+        # The query is too deeply nested for the parser, so it is
+        # evaluated as it is
+        return None
+
+    predicate = namespace['predicate']
+    _compiled_predicates[hashval] = predicate
+
+    return predicate
+
 class QueryLike(Protocol):
     """
     A typing protocol that acts like a query.
@@ -71,6 +203,7 @@ class QueryInstance:
     def __init__(self, test: Callable[[Mapping], bool], hashval: Optional[Tuple]):
         self._test = test
         self._hash = hashval
+        self._predicate: Optional[Callable[[Mapping], bool]] = None
 
     def __call__(self, value: Mapping) -> bool:
         """
@@ -98,6 +231,20 @@ class QueryInstance:
         """
         return self._hash is not None
 
+    def _compile(self) -> Callable[[Mapping], bool]:
+        """
+        Get a function evaluating this query.
+
+        For simple queries this is a specialized function generated by
+        :func:`_compile_predicate`. Otherwise the query itself is returned.
+        """
+        if self._predicate is None:
+            predicate = None
+            if self.is_cacheable():
+                predicate = _compile_predicate(self._hash)
+            self._predicate = predicate or self
+        return self._predicate
+
     def __and__(self, other: 'QueryInstance') -> 'QueryInstance':
         if self.is_cacheable() and other.is_cacheable():
             hashval = ('and', frozenset([self._hash, other._hash]))
@@ -56,6 +56,24 @@ class Storage(ABC):
         """
         pass
 
+    def count(self, name: str) -> int:
+        """
+        Optional: Count the documents stored in a table.
+
+        The default implementation reads the complete state. Storages that
+        can answer this more cheaply may override it. Tables only call this
+        method if it is overridden and they have no up-to-date cached data,
+        otherwise they count the documents themselves.
+
+        :param name: The name of the table.
+        """
+        data = self.read()
+        if data is None:
+            return 0
+
+        table = data.get(name)
+        return len(table) if isinstance(table, dict) else 0
+
     def close(self) -> None:
         """
         Optional: Close open file handles, etc.
@@ -130,4 +148,11 @@ class MemoryStorage(Storage):
         return self.memory
 
     def write(self, data: Dict[str, Dict[str, Any]]) -> None:
-        self.memory = data
\ No newline at end of file
+        self.memory = data
+
+    def count(self, name: str) -> int:
+        if self.memory is None:
+            return 0
+
+        table = self.memory.get(name)
+        return len(table) if isinstance(table, dict) else 0
\ No newline at end of file
@@ -2,12 +2,94 @@
 This module implements tables, the central place for accessing and manipulating
 data in TinyDB.
 """
+import os
 from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Union, cast, Tuple
-from .queries import QueryLike
+from .queries import QueryInstance, QueryLike
 from .storages import Storage
 from .utils import LRUCache
 __all__ = ('Document', 'Table')
 
+
+def _storage_version(storage: Storage) -> Tuple:
+    """
+    Get a value that changes whenever the data of a storage changes.
+
+    It consists of a write counter that is kept as an attribute on the storage
+    instance and is bumped by :func:`_bump_storage_version` on every write
+    done through TinyDB. For storages backed by a file handle (like the
+    :class:`~tinydb.storages.JSONStorage`), the modification time and size of
+    the file are added, so writes by other processes are noticed as well.
+
+    It allows tables to tell whether their cached data is still current.
+    """
+    file_state = None
+    handle = getattr(storage, '_handle', None)
+    if handle is not None:
+        try:
+            stat = os.fstat(handle.fileno())
+            file_state = (stat.st_mtime_ns, stat.st_size)
+        except (AttributeError, OSError, ValueError):
+            pass
+
+    return getattr(storage, '_version', 0), file_state
+
+
+def _get_nested_keys(doc: Mapping) -> Tuple[Tuple[str, bool], ...]:
+    """
+    Find the values of a document that are dicts or lists.
+
+    Returns their keys, each together with whether the value contains
+    further dicts or lists.
+    """
+    nested_keys = []
+    for key, value in doc.items():
+        if isinstance(value, dict):
+            nested_keys.append((key, any(isinstance(item, (dict, list))
+                                         for item in value.values())))
+        elif isinstance(value, list):
+            nested_keys.append((key, any(isinstance(item, (dict, list))
+                                         for item in value)))
+    return tuple(nested_keys)
+
+
+def _copy_value(value):
+    """
+    Copy the dicts and lists in a (JSON-like) value.
+    """
+    if isinstance(value, dict):
+        return {key: _copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    return value
+
+
+def _detach(doc: Mapping, nested_keys: Tuple[Tuple[str, bool], ...]) -> dict:
+    """
+    Copy a document so it doesn't share mutable values with the table data.
+
+    Documents are cached after reading and writing, so nested lists and
+    dicts handed to or from the user must be copied. Otherwise modifying
+    them would change the cached data, which is written back with the next
+    unrelated update.
+
+    Tables keep the result of :func:`_get_nested_keys` for the documents
+    containing nested values, so only these documents and values have to be
+    copied and only values nested more than one level deep need to be
+    copied recursively.
+    """
+    doc = dict(doc)
+    for key, deep in nested_keys:
+        value = doc[key]
+        doc[key] = _copy_value(value) if deep else value.copy()
+    return doc
+
+
+def _bump_storage_version(storage: Storage) -> None:
+    """
+    Mark the data of a storage as changed.
+    """
+    storage._version = getattr(storage, '_version', 0) + 1  # type: ignore
+
 class Document(dict):
     """
     A document stored in the database.
@@ -37,6 +119,15 @@ class Table:
         data, the whole cache is discarded as the query results may have
         changed.
 
+    .. admonition:: Read Cache
+
+        The data read from the storage is cached as well. Every write done
+        through TinyDB bumps a version counter on the storage, which tells
+        all tables using this storage to read it again. For storages using
+        a file handle, changes of the file's modification time or size are
+        detected as well. If the storage is modified by other means, call
+        :meth:`clear_cache` to discard the cached data.
+
     .. admonition:: Customization
 
         For customization, the following class variables can be set:
@@ -70,6 +161,9 @@ class Table:
         self._name = name
         self._query_cache: LRUCache[QueryLike, List[Document]] = self.query_cache_class(capacity=cache_size)
         self._next_id = None
+        self._read_cache: Optional[Tuple[Dict[str, Dict], Dict[int, Mapping]]] = None
+        self._read_cache_version: Optional[Tuple] = None
+        self._nested_keys: Dict[int, Tuple[Tuple[str, bool], ...]] = {}
 
     def __repr__(self):
         args = ['name={!r}'.format(self.name), 'total={}'.format(len(self)), 'storage={}'.format(self._storage)]
@@ -99,20 +193,20 @@ class Table:
         if not isinstance(document, Mapping):
             raise ValueError('Document is not a Mapping')
 
+        data = self._read_raw()
+
         if isinstance(document, Document):
             doc_id = document.doc_id
-            document = dict(document)
-            if doc_id in self._read_table():
+            if doc_id in data[1]:
                 raise ValueError('Document ID already exists')
+            self._update_next_id(doc_id)
         else:
             doc_id = self._get_next_id()
 
-        data = dict(document)
-
         def updater(table: Dict[int, Mapping]):
-            table[doc_id] = data
+            self._store(table, doc_id, document)
 
-        self._update_table(updater)
+        self._update_table(updater, data)
         self._query_cache.clear()
 
         return doc_id
@@ -125,32 +219,45 @@ class Table:
         :returns: a list containing the inserted documents' IDs
         """
         doc_ids = []
-        data = []
+        new_docs = []
         documents = list(documents)
 
         if len(documents) == 1 and not isinstance(documents[0], Mapping):
             raise ValueError('Document is not a Mapping')
 
-        table = self._read_table()
+        data = self._read_raw()
+        table = data[1]
+
+        # Check the documents and the IDs chosen by the user first, so the
+        # IDs generated afterwards can't collide with any of them
+        explicit_ids = set()
         for doc in documents:
             if not isinstance(doc, Mapping):
                 raise ValueError('Document is not a Mapping')
 
             if isinstance(doc, Document):
                 doc_id = doc.doc_id
-                doc = dict(doc)
-                if doc_id in table:
+                if doc_id in table or doc_id in explicit_ids:
                     raise ValueError('Document ID already exists')
+                explicit_ids.add(doc_id)
+
+        # Only raise the next ID once all documents have been checked
+        if explicit_ids:
+            self._update_next_id(max(explicit_ids))
+
+        for doc in documents:
+            if isinstance(doc, Document):
+                doc_id = doc.doc_id
             else:
                 doc_id = self._get_next_id()
             doc_ids.append(doc_id)
-            data.append((doc_id, dict(doc)))
+            new_docs.append((doc_id, doc))
 
         def updater(table: Dict[int, Mapping]):
-            for doc_id, doc in data:
-                table[doc_id] = doc
+            for doc_id, doc in new_docs:
+                self._store(table, doc_id, doc)
 
-        self._update_table(updater)
+        self._update_table(updater, data)
         self._query_cache.clear()
 
         return doc_ids
@@ -162,7 +269,15 @@ class Table:
         :returns: a list with all documents.
         """
         table = self._read_table()
-        return [self.document_class(doc, self.document_id_class(doc_id))
+        nested_keys = self._nested_keys
+        document_class = self.document_class
+        document_id_class = self.document_id_class
+        if not nested_keys:
+            return [document_class(doc, document_id_class(doc_id))
+                    for doc_id, doc in table.items()]
+        return [document_class(_detach(doc, nested_keys[doc_id])
+                               if doc_id in nested_keys else doc,
+                               document_id_class(doc_id))
                 for doc_id, doc in table.items()]
 
     def search(self, cond: QueryLike) -> List[Document]:
@@ -172,13 +287,30 @@ class Table:
         :param cond: the condition to check against
         :returns: list of matching documents
         """
-        if hasattr(cond, 'is_cacheable') and not cond.is_cacheable():
-            return [doc for doc in self.all() if cond(doc)]
+        cacheable = not hasattr(cond, 'is_cacheable') or cond.is_cacheable()
+
+        if cacheable:
+            # A single lookup both checks the cache and marks the entry as
+            # recently used. Cached results are lists, never None.
+            cached_results = self._query_cache.get(cond)
+            if cached_results is not None:
+                return list(cached_results)
 
-        if cond in self._query_cache:
-            return list(self._query_cache[cond])
+        # Run the condition on the raw documents and only convert the
+        # matching ones into the document class
+        test = cond._compile() if isinstance(cond, QueryInstance) else cond
+        table = self._read_table()
+        nested_keys = self._nested_keys
+        document_class = self.document_class
+        document_id_class = self.document_id_class
+        docs = [document_class(_detach(doc, nested_keys[doc_id])
+                               if doc_id in nested_keys else doc,
+                               document_id_class(doc_id))
+                for doc_id, doc in table.items() if test(doc)]
+
+        if not cacheable:
+            return docs
 
-        docs = [doc for doc in self.all() if cond(doc)]
         self._query_cache[cond] = docs
 
         return list(docs)
@@ -201,17 +333,27 @@ class Table:
             raise RuntimeError('Cannot get documents without a condition or document ID')
 
         if doc_id is not None:
-            table = self._read_table()
-            if doc_id in table:
-                return self.document_class(table[doc_id], self.document_id_class(doc_id))
-            return None
+            doc = self._read_table().get(doc_id)
+            if doc is None:
+                return None
+            if doc_id in self._nested_keys:
+                doc = _detach(doc, self._nested_keys[doc_id])
+            return self.document_class(doc, self.document_id_class(doc_id))
 
         if doc_ids is not None:
+            # Use a single lookup per ID instead of checking for the ID first.
+            # Stored documents are dicts, so None means the ID doesn't exist.
             docs = []
-            table = self._read_table()
+            get_doc = self._read_table().get
+            nested_keys = self._nested_keys
+            document_class = self.document_class
+            document_id_class = self.document_id_class
             for did in doc_ids:
-                if did in table:
-                    docs.append(self.document_class(table[did], self.document_id_class(did)))
+                doc = get_doc(did)
+                if doc is not None:
+                    if did in nested_keys:
+                        doc = _detach(doc, nested_keys[did])
+                    docs.append(document_class(doc, document_id_class(did)))
             return docs if docs else None
 
         if cond is not None:
@@ -252,6 +394,8 @@ class Table:
         if doc_ids is not None:
             doc_ids = list(doc_ids)
 
+        perform_update = self._get_update_function(fields)
+
         def updater(table: Dict[int, Mapping]):
             updated_ids = []
 
@@ -259,22 +403,14 @@ class Table:
                 for doc_id in doc_ids:
                     if doc_id in table:
                         updated_ids.append(doc_id)
-                        if callable(fields):
-                            doc = table[doc_id].copy()
-                            fields(doc)
-                            table[doc_id] = doc
-                        else:
-                            table[doc_id].update(fields)
+                        perform_update(table, doc_id)
             else:
-                for doc_id, doc in list(table.items()):
+                # Only existing entries are replaced, so the table can be
+                # iterated without taking a snapshot first
+                for doc_id, doc in table.items():
                     if cond is None or cond(doc):
                         updated_ids.append(doc_id)
-                        if callable(fields):
-                            doc = doc.copy()
-                            fields(doc)
-                            table[doc_id] = doc
-                        else:
-                            table[doc_id].update(fields)
+                        perform_update(table, doc_id)
 
             return updated_ids
 
@@ -289,9 +425,24 @@ class Table:
 
         :returns: a list containing the updated document's ID
         """
-        updated_ids = []
-        for fields, cond in updates:
-            updated_ids.extend(self.update(fields, cond))
+        updates = list(updates)
+
+        # Apply all updates in a single read/write cycle
+        def updater(table: Dict[int, Mapping]):
+            updated_ids = []
+
+            for fields, cond in updates:
+                perform_update = self._get_update_function(fields)
+                for doc_id, doc in table.items():
+                    if cond is None or cond(doc):
+                        updated_ids.append(doc_id)
+                        perform_update(table, doc_id)
+
+            return updated_ids
+
+        updated_ids = self._update_table(updater)
+        self._query_cache.clear()
+
         return updated_ids
 
     def upsert(self, document: Mapping, cond: Optional[QueryLike]=None) -> List[int]:
@@ -309,18 +460,41 @@ class Table:
         """
         if isinstance(document, Document):
             doc_id = document.doc_id
-            updated = self.update(document, doc_ids=[doc_id])
-            if updated:
-                return updated
+        elif cond is None:
+            raise ValueError("If you don't specify a search query, you must "
+                             "specify a doc_id. Hint: use a table.Document "
+                             "object.")
+        else:
+            doc_id = None
+
+        perform_update = self._get_update_function(document)
+
+        # Update or insert the documents in a single read/write cycle
+        # instead of running update() and insert() one after the other
+        def updater(table: Dict[int, Mapping]):
+            if doc_id is not None:
+                if doc_id in table:
+                    perform_update(table, doc_id)
+                else:
+                    self._store(table, doc_id, document)
+                    self._update_next_id(doc_id)
+                return [doc_id]
+
+            updated_ids = [key for key, doc in table.items() if cond(doc)]
+            for updated_id in updated_ids:
+                perform_update(table, updated_id)
 
-            document = dict(document)
-            return [self.insert(document)]
+            if not updated_ids:
+                new_id = self._get_next_id()
+                self._store(table, new_id, document)
+                updated_ids.append(new_id)
 
-        updated = self.update(document, cond)
-        if updated:
-            return updated
+            return updated_ids
 
-        return [self.insert(document)]
+        upserted_ids = self._update_table(updater)
+        self._query_cache.clear()
+
+        return upserted_ids
 
     def remove(self, cond: Optional[QueryLike]=None, doc_ids: Optional[Iterable[int]]=None) -> List[int]:
         """
@@ -344,11 +518,15 @@ class Table:
                     if doc_id in table:
                         removed.append(doc_id)
                         del table[doc_id]
+                        self._nested_keys.pop(doc_id, None)
             else:
-                for doc_id, doc in list(table.items()):
-                    if cond(doc):
-                        removed.append(doc_id)
-                        del table[doc_id]
+                # Collect the matching IDs first as entries can't be deleted
+                # while iterating over the table
+                removed = [doc_id for doc_id, doc in table.items()
+                           if cond(doc)]
+                for doc_id in removed:
+                    del table[doc_id]
+                    self._nested_keys.pop(doc_id, None)
 
             return removed
 
@@ -363,6 +541,7 @@ class Table:
         """
         def updater(table: Dict[int, Mapping]):
             table.clear()
+            self._nested_keys.clear()
             return []
 
         self._update_table(updater)
@@ -379,14 +558,26 @@ class Table:
 
     def clear_cache(self) -> None:
         """
-        Clear the query cache.
+        Clear the query cache and the cached table data.
         """
         self._query_cache.clear()
+        self._read_cache = None
+        self._read_cache_version = None
 
     def __len__(self):
         """
         Count the total number of documents in this table.
         """
+        if self._read_cache is not None and \
+                self._read_cache_version == _storage_version(self._storage):
+            return len(self._read_cache[1])
+
+        # Let the storage count the documents if it has a cheaper way to do
+        # this. Otherwise read the table, which also fills the read cache.
+        count = getattr(type(self._storage), 'count', None)
+        if count is not None and count is not Storage.count:
+            return self._storage.count(self._name)
+
         return len(self._read_table())
 
     def __iter__(self) -> Iterator[Document]:
@@ -395,24 +586,90 @@ class Table:
 
         :returns: an iterator over all documents.
         """
-        for doc_id, doc in self._read_table().items():
-            yield self.document_class(doc, self.document_id_class(doc_id))
+        document_class = self.document_class
+        document_id_class = self.document_id_class
+        table = self._read_table()
+        nested_keys = self._nested_keys
+        if not nested_keys:
+            for doc_id, doc in table.items():
+                yield document_class(doc, document_id_class(doc_id))
+            return
+        for doc_id, doc in table.items():
+            yield document_class(_detach(doc, nested_keys[doc_id])
+                                 if doc_id in nested_keys else doc,
+                                 document_id_class(doc_id))
+
+    def _get_update_function(self, fields: Union[Mapping, Callable[[Mapping], None]]) -> Callable[[Dict[int, Mapping], int], None]:
+        """
+        Get a function applying ``fields`` to a document in the table data.
+
+        This is decided once per update instead of for every updated document.
+        """
+        if callable(fields):
+            def perform_update(table: Dict[int, Mapping], doc_id: int):
+                # The function may fail halfway through, so it runs on a copy
+                doc = table[doc_id].copy()
+                fields(doc)
+                table[doc_id] = doc
+                self._track_nested(doc_id, doc)
+        else:
+            fields_nested_keys = _get_nested_keys(fields)
+
+            def perform_update(table: Dict[int, Mapping], doc_id: int):
+                doc = table[doc_id]
+                if fields_nested_keys:
+                    doc.update(_detach(fields, fields_nested_keys))
+                else:
+                    doc.update(fields)
+                self._track_nested(doc_id, doc)
+
+        return perform_update
+
+    def _store(self, table: Dict[int, Mapping], doc_id: int, document: Mapping) -> None:
+        """
+        Store a copy of a document in the table data.
+
+        The copy is a plain dict, which also drops the Document wrapper.
+        """
+        nested_keys = _get_nested_keys(document)
+        if nested_keys:
+            table[doc_id] = _detach(document, nested_keys)
+            self._nested_keys[doc_id] = nested_keys
+        else:
+            table[doc_id] = dict(document)
+            self._nested_keys.pop(doc_id, None)
+
+    def _track_nested(self, doc_id: int, doc: Mapping) -> None:
+        """
+        Remember which values of a changed document have to be copied.
+        """
+        nested_keys = _get_nested_keys(doc)
+        if nested_keys:
+            self._nested_keys[doc_id] = nested_keys
+        else:
+            self._nested_keys.pop(doc_id, None)
 
     def _get_next_id(self):
         """
         Return the ID for a newly inserted document.
         """
         if self._next_id is None:
+            # The keys have already been converted to the document ID class
+            # when reading the table
             table = self._read_table()
-            if table:
-                self._next_id = max(int(key) for key in table.keys()) + 1
-            else:
-                self._next_id = 1
+            self._next_id = max(table) + 1 if table else 1
 
         next_id = self._next_id
         self._next_id = next_id + 1
         return next_id
 
+    def _update_next_id(self, doc_id: int) -> None:
+        """
+        Make sure an explicitly chosen document ID won't be used for
+        documents inserted later on.
+        """
+        self._next_id = max(self._get_next_id(), doc_id + 1)
+
     def _read_table(self) -> Dict[int, Mapping]:
         """
         Read the table data from the underlying storage.
@@ -421,18 +678,58 @@ class Table:
         we may not want to convert *all* documents when returning
         only one document for example.
         """
+        return self._read_raw()[1]
+
+    def _read_raw(self) -> Tuple[Dict[str, Dict], Dict[int, Mapping]]:
+        """
+        Read the complete data from the underlying storage.
+
+        Returns the data as read from the storage together with this table's
+        data, normalized to a ``dict`` whose keys have been converted to the
+        document ID class, as storages like the JSON storage can only store
+        string keys. The data read from the storage is left untouched, as
+        some storages return their live state. The normalized table is only
+        put into it by :meth:`_update_table` right before writing.
+
+        The data is cached until the storage has been written to again.
+        """
+        version = _storage_version(self._storage)
+        if self._read_cache is not None and \
+                self._read_cache_version == version:
+            return self._read_cache
+
         raw_data = self._storage.read()
         if raw_data is None:
             raw_data = {}
 
+        dropped = self._name not in raw_data
         table = raw_data.get(self._name, {})
         if not isinstance(table, dict):
             table = {}
-            raw_data[self._name] = table
 
-        return table
+        doc_id_class = self.document_id_class
+        table = {doc_id_class(doc_id): doc for doc_id, doc in table.items()}
+
+        self._read_cache = raw_data, table
+        self._read_cache_version = version
+        self._nested_keys = {}
+        for doc_id, doc in table.items():
+            self._track_nested(doc_id, doc)
+
+        if dropped:
+            # The table has been dropped, so its IDs start over
+            self._next_id = None
+        else:
+            # Someone else may have inserted documents in the meantime. The
+            # next ID is only ever raised, so IDs of removed documents are
+            # not reused.
+            self._next_id = max(self._next_id or 1,
+                                max(table) + 1 if table else 1)
 
-    def _update_table(self, updater: Callable[[Dict[int, Mapping]], None]):
+        return self._read_cache
+
+    def _update_table(self, updater: Callable[[Dict[int, Mapping]], None],
+                      data: Optional[Tuple[Dict[str, Dict], Dict[int, Mapping]]] = None):
         """
         Perform a table update operation.
 
@@ -444,14 +741,32 @@ class Table:
 
         As a further optimization, we don't convert the documents into the
         document class, as the table data will *not* be returned to the user.
-        """
-        raw_data = self._storage.read()
-        if raw_data is None:
-            raw_data = {}
 
-        table = raw_data.get(self._name, {})
-        result = updater(table)
-        raw_data[self._name] = table
-        self._storage.write(raw_data)
+        The written data is kept as the table's read cache, so reading the
+        table right after a write does not hit the storage again.
 
-        return result
\ No newline at end of file
+        :param updater: the function modifying the table data
+        :param data: the data returned by :meth:`_read_raw`, if the caller
+                     has already read it
+        """
+        if data is None:
+            data = self._read_raw()
+        raw_data, table = data
+
+        try:
+            result = updater(table)
+            raw_data[self._name] = table
+            self._storage.write(raw_data)
+        except BaseException:
+            # The cached data may have been modified in place, so it
+            # doesn't match the storage contents anymore
+            self._read_cache = None
+            raise
+        finally:
+            # Even a failed write may have changed the storage contents
+            _bump_storage_version(self._storage)
+
+        self._read_cache = data
+        self._read_cache_version = _storage_version(self._storage)
+
+        return result
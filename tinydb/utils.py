@@ -33,7 +33,7 @@ class LRUCache(abc.MutableMapping, Generic[K, V]):
     entry will be discarded.
 
     This is implemented using an ``OrderedDict``. On every access the accessed
-    entry is moved to the front by re-inserting it into the ``OrderedDict``.
+    entry is moved to the front using ``OrderedDict.move_to_end``.
     When adding an entry and the cache size is exceeded, the last entry will
     be discarded.
     """
@@ -50,19 +50,19 @@ class LRUCache(abc.MutableMapping, Generic[K, V]):
 
     def __setitem__(self, key: K, value: V) -> None:
         if key in self.cache:
-            del self.cache[key]
-        self.cache[key] = value
-        if self.capacity is not None and len(self.cache) > self.capacity:
-            self.cache.popitem(last=False)  # Remove first item (least recently used)
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+        else:
+            self.cache[key] = value
+            if self.capacity is not None and len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)  # Remove first item (least recently used)
 
     def __delitem__(self, key: K) -> None:
         del self.cache[key]
 
     def __getitem__(self, key) -> V:
-        if key not in self.cache:
-            raise KeyError(key)
-        value = self.cache.pop(key)
-        self.cache[key] = value  # Move to end
+        value = self.cache[key]
+        self.cache.move_to_end(key)
         return value
 
     def __iter__(self) -> Iterator[K]:
@@ -96,22 +96,88 @@ class FrozenDict(dict):
     class removes the mutability and implements the ``__hash__`` method.
     """
 
+    _hash = None
+
     def __hash__(self):
-        return hash(tuple(sorted(self.items())))
+        # The hash is computed only once as the dict cannot be modified.
+        # Using a frozenset avoids sorting the items, which also fails
+        # for keys of different types.
+        if self._hash is None:
+            self._hash = hash(frozenset(self.items()))
+        return self._hash
     __setitem__ = _immutable
     __delitem__ = _immutable
     clear = _immutable
     setdefault = _immutable
     popitem = _immutable
+    update = _immutable
+    pop = _immutable
+
+_CONTAINER_TYPES = (dict, list, tuple, set)
+
 
 def freeze(obj):
     """
     Freeze an object by making it immutable and thus hashable.
     """
+    try:
+        return _freeze_recursive(obj)
+    except RecursionError:
+        # Too deeply nested (or containing itself), so use an explicit
+        # stack instead
+        return _freeze_iterative(obj)
+
+
+def _freeze_recursive(obj):
+    """
+    Freeze an object, recursing into nested containers.
+    """
     if isinstance(obj, dict):
-        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+        return FrozenDict([(k, _freeze_recursive(v)) for k, v in obj.items()])
     elif isinstance(obj, (list, tuple)):
-        return tuple(freeze(el) for el in obj)
+        return tuple([_freeze_recursive(el) for el in obj])
     elif isinstance(obj, set):
-        return frozenset(freeze(el) for el in obj)
-    return obj
\ No newline at end of file
+        return frozenset([_freeze_recursive(el) for el in obj])
+    return obj
+
+
+def _freeze_iterative(obj):
+    """
+    Freeze an object without recursion.
+
+    Containers are frozen bottom-up into a mapping keyed by the id of the
+    original container.
+    """
+    frozen = {}
+    in_progress = set()
+    stack = [obj]
+
+    while stack:
+        current = stack[-1]
+        key = id(current)
+        if key in frozen or not isinstance(current, _CONTAINER_TYPES):
+            stack.pop()
+            continue
+
+        # Freeze the nested containers before the container itself
+        children = current.values() if isinstance(current, dict) else current
+        pending = [child for child in children
+                   if isinstance(child, _CONTAINER_TYPES)
+                   and id(child) not in frozen]
+        if pending:
+            if key in in_progress:
+                raise ValueError('Cannot freeze an object containing itself')
+            in_progress.add(key)
+            stack.extend(pending)
+            continue
+
+        stack.pop()
+        if isinstance(current, dict):
+            frozen[key] = FrozenDict([(k, frozen[id(v)] if isinstance(v, _CONTAINER_TYPES) else v)
+                                      for k, v in current.items()])
+        else:
+            items = [frozen[id(el)] if isinstance(el, _CONTAINER_TYPES) else el
+                     for el in current]
+            frozen[key] = frozenset(items) if isinstance(current, set) else tuple(items)
+
+    return frozen.get(id(obj), obj)